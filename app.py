@@ -1,33 +1,80 @@
 import os
+import io
+import csv
 import json
-import pandas as pd
-from flask import Flask, request, jsonify, send_file, render_template
-from werkzeug.utils import secure_filename
-from pypdf import PdfReader
+import hashlib
+from flask import Flask, Response, request, jsonify, send_file, render_template
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
+import orjson
+import pymupdf
 from fpdf import FPDF
 from openai import OpenAI  # <--- CHANGED: Switched to OpenAI
+from apify_client import ApifyClient
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
 import requests
 import re
-import time 
+import shutil
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
+from json_repair import repair_json
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify / request.json backed by orjson (Rust) instead of the stdlib encoder."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # --- CONFIGURATION ---
-UPLOAD_FOLDER = 'uploads'
 STATIC_FOLDER = 'static'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(STATIC_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are parsed in memory, so bound their size (Werkzeug answers 413 above this)
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+
+# Very large CVs go through poppler's pdftotext binary when it is installed (looked up once)
+PDFTOTEXT_PATH = shutil.which("pdftotext")
+LARGE_PDF_BYTES = 2 * 1024 * 1024
+# Bump when the extracted text changes shape (e.g. the "\f" page separator) so cached texts are re-extracted
+PDF_TEXT_VERSION = 2
+
+# Compress JSON/CSV/HTML responses (job lists with descriptions shrink 5-10x); PDFs are already deflated
+app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/csv']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+Compress(app)
 
 # 1. SETUP OPENAI API (CHANGED)
 # Make sure to add "OPENAI_API_KEY" to your Render Environment Variables
+# The SDK retries 429 / 5xx responses and timed-out attempts itself with backoff
+# (up to 8 s, or the 429's Retry-After of up to 60 s), so a call can take
+# (retries + 1) x per-attempt timeout plus backoff: ~210 s for the CV call with
+# these defaults. gevent workers don't cut requests at gunicorn's timeout
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 1))
+# Per-attempt timeout (the SDK default is 10 minutes); sized for the longest CV answer
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", 100))
+# A scoring answer is a few lines, so its attempts time out much sooner
+SCORING_TIMEOUT = float(os.environ.get("OPENAI_SCORING_TIMEOUT", 30))
+# Scoring is a short ranking task; point it at a cheaper model to cut spend
+CV_MODEL = os.environ.get("OPENAI_CV_MODEL", "gpt-4o")
+SCORING_MODEL = os.environ.get("OPENAI_SCORING_MODEL", "gpt-4o")
+# Prompt budget: ~12k chars (~3k tokens) covers the first 2-3 pages of a CV
+MAX_CV_CHARS = 12000
+# The answer restates the whole CV anonymised, plus the search fields: cap it at
+# twice the input budget (~4 chars per token) so only runaway generations hit it
+CV_MAX_OUTPUT_TOKENS = 2 * MAX_CV_CHARS // 4 + 1000
 client = None
 if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = OpenAI(api_key=OPENAI_API_KEY, max_retries=OPENAI_MAX_RETRIES, timeout=OPENAI_TIMEOUT)
 
 # 2. SETUP GOOGLE SHEETS
 SHEET_URL = None
@@ -43,45 +90,87 @@ except Exception as e:
     print(f"Warning: Google Sheets not connected. Error: {e}")
     sheet = None
 
+# Deferred side effects (Sheets logging) run here after the response is built;
+# a small shared pool instead of a new thread per request
+BACKGROUND = ThreadPoolExecutor(max_workers=2, thread_name_prefix="background")
+
+# 3. ULTRA-STRICT JOB FILTER
+FORBIDDEN_WORDS = [
+    "recruitment", "recruiter", "talent acquisition", "hr manager", "human resources",
+    "headhunter", "agency", "staffing", "werving", "selectie",
+    "supply chain", "logistics", "warehouse", "operations manager", "floor manager",
+    "store manager", "category manager", "facility", "coordinator", "commissioning",
+    "quality", "environmental", "audit", "compliance", "legal",
+    "sales", "account manager", "marketing", "commercial", "growth", "sme",
+    "financial", "accountant", "tax", "treasury", "controller",
+    "cleaner", "driver", "mechanic", "nurse", "teacher", "internship", "stage"
+]
+# One alternation scans a title in a single regex pass (same substring semantics as `in`)
+FORBIDDEN_RE = re.compile("|".join(map(re.escape, FORBIDDEN_WORDS)), re.IGNORECASE)
+
+# Search-title cleanup: drop "(...)" qualifiers and split "A/B" titles
+PAREN_RE = re.compile(r'\(.*?\)')
+TITLE_CLEAN = str.maketrans({'/': ' '})
+
+# 4. SETUP APIFY (LinkedIn Jobs)
+# One client per process keeps its HTTP connection pool (and retry/backoff) warm across searches
+APIFY_API_KEY = os.environ.get("APIFY_API_KEY")
+apify_client = None
+if APIFY_API_KEY:
+    apify_client = ApifyClient(APIFY_API_KEY)
+
+# 5. AI RESPONSE CACHE
+# Re-uploads of the same CV (and re-scoring the same jobs) skip PDF parsing and the OpenAI round-trip
+CACHE_DIR = os.environ.get("CACHE_DIR", "/tmp/cv_cache")
+CACHE_TTL = 86400 * 30  # 30 days
+ai_cache = diskcache.Cache(CACHE_DIR)
+
 # --- PDF GENERATOR CLASS ---
+# Static page furniture, resolved once per process instead of once per page
+LOGO_PATH = os.path.join(app.root_path, 'static', 'logo.png')
+LOGO_EXISTS = os.path.exists(LOGO_PATH)
+# FPDF only caches images per document; decode the PNG once per process and
+# hand each new document its own copy (FPDF stamps 'i'/'n' and drops 'data' on output)
+LOGO_INFO = FPDF()._parsepng(LOGO_PATH) if LOGO_EXISTS else None
+
+# (x, heading, cell width, content) for each footer column
+FOOTER_COLUMNS = (
+    (10, "POST", 35, "Atoomweg 63\n3542AA Utrecht\nNederland"),
+    (50, "BEZOEK", 35, "Atoomweg 63\n3542AA Utrecht\nwww.bvenp.nl"),
+    (90, "CONTACT", 35, "T 030 3200250\nE info@bvenp.nl"),
+    (130, "KVK UTRECHT", 30, "61798053\n\nBTW\nNL854492793801"),
+    (165, "BANK", 35, "NL57INGB0008955004\n\nBIC\nINGBNL2A"),
+)
+FOOTER_DISCLAIMER = "Op onze overeenkomsten zijn de algemene voorwaarden van Bart Vink & Partners van toepassing."
+
 class BVnP_PDF(FPDF):
     def header(self):
         self.set_fill_color(30, 58, 138)
-        logo_path = os.path.join(app.root_path, 'static', 'logo.png')
-        if os.path.exists(logo_path):
-            self.image(logo_path, x=60, y=2, w=90)
+        if LOGO_EXISTS:
+            if LOGO_PATH not in self.images:
+                self.images[LOGO_PATH] = dict(LOGO_INFO, i=len(self.images) + 1)
+            self.image(LOGO_PATH, x=60, y=2, w=90)
         self.ln(45)
 
     def footer(self):
         self.set_y(-40)
         self.set_font('Arial', 'B', 7)
         self.set_text_color(30, 58, 138)
-        col1, col2, col3, col4, col5 = 10, 50, 90, 130, 165
         y_head = self.get_y()
         y_content = y_head + 4
         
-        self.text(col1, y_head, "POST")
-        self.text(col2, y_head, "BEZOEK")
-        self.text(col3, y_head, "CONTACT")
-        self.text(col4, y_head, "KVK UTRECHT")
-        self.text(col5, y_head, "BANK")
+        for x, heading, _, _ in FOOTER_COLUMNS:
+            self.text(x, y_head, heading)
 
         self.set_font('Arial', '', 6)
         self.set_text_color(80, 80, 80)
-        self.set_xy(col1, y_content)
-        self.multi_cell(35, 3, "Atoomweg 63\n3542AA Utrecht\nNederland")
-        self.set_xy(col2, y_content)
-        self.multi_cell(35, 3, "Atoomweg 63\n3542AA Utrecht\nwww.bvenp.nl")
-        self.set_xy(col3, y_content)
-        self.multi_cell(35, 3, "T 030 3200250\nE info@bvenp.nl")
-        self.set_xy(col4, y_content)
-        self.multi_cell(30, 3, "61798053\n\nBTW\nNL854492793801")
-        self.set_xy(col5, y_content)
-        self.multi_cell(35, 3, "NL57INGB0008955004\n\nBIC\nINGBNL2A")
+        for x, _, width, content in FOOTER_COLUMNS:
+            self.set_xy(x, y_content)
+            self.multi_cell(width, 3, content)
         self.set_xy(10, -10)
         self.set_font('Arial', 'I', 5)
         self.set_text_color(150, 150, 150)
-        self.cell(0, 5, "Op onze overeenkomsten zijn de algemene voorwaarden van Bart Vink & Partners van toepassing.", 0, 0, 'C')
+        self.cell(0, 5, FOOTER_DISCLAIMER, 0, 0, 'C')
 
     def section_row(self, heading, content):
         left_col_x, right_col_x, right_col_width = 15, 65, 130
@@ -103,75 +192,163 @@ class BVnP_PDF(FPDF):
 
 # --- HELPER FUNCTIONS ---
 
-def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
+def extract_text_from_pdf(pdf_bytes):
+    # Works on the uploaded bytes directly; nothing is written to disk
+    if PDFTOTEXT_PATH and len(pdf_bytes) > LARGE_PDF_BYTES:
+        try:
+            result = subprocess.run([PDFTOTEXT_PATH, "-q", "-", "-"], input=pdf_bytes, capture_output=True, check=True, timeout=60)
+            return result.stdout.decode("utf-8", "replace")
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"⚠️ pdftotext failed, falling back to PyMuPDF: {e}")
+
+    # PyMuPDF parses in C; the context manager releases the document
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        # Form feed between pages, as pdftotext does, so page furniture can be spotted later
+        return "\f".join(page.get_text("text") for page in doc)
+
+def extract_cv_text(pdf_bytes):
+    # Re-uploads of the same file skip parsing; keyed on the raw bytes
+    key = f"pdf-text:v{PDF_TEXT_VERSION}:" + hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+    text = ai_cache.get(key)
+    if text is None:
+        text = extract_text_from_pdf(pdf_bytes)
+        ai_cache.set(key, text, expire=CACHE_TTL)
     return text
 
+def _strict_object(**properties):
+    # Strict structured outputs require every property listed and no extras
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+STRING = {"type": "string"}
+STRING_LIST = {"type": "array", "items": STRING}
+
+# Property order is generation order: "structured_cv" comes first
+CV_SCHEMA = _strict_object(
+    structured_cv=_strict_object(
+        role_title=STRING,
+        summary=STRING,
+        skills=STRING_LIST,
+        languages=STRING_LIST,
+        experience={"type": "array", "items": _strict_object(title=STRING, company=STRING, dates=STRING, description=STRING)},
+        education={"type": "array", "items": _strict_object(degree=STRING, school=STRING, dates=STRING)},
+    ),
+    real_name=STRING,
+    job_titles=STRING_LIST,
+    keywords_to_avoid=STRING_LIST,
+)
+
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+# Non-empty lines at the top and bottom of a page searched for headers/footers
+PAGE_EDGE_LINES = 3
+
+CV_SYSTEM_PROMPT = "You are an expert Headhunter. You must response in JSON format."
+CV_PROMPT_TEMPLATE = """
+Input CV Text: {text}
+
+TASKS:
+1. Identify Real Name.
+2. ANONYMIZE content.
+3. Identify Seniority.
+4. Generate Search Data (Job Titles & Avoid List).
+
+Fill every field of the response schema; "structured_cv" is anonymized.
+"""
+
+def cache_key(*parts):
+    """Stable content hash for a JSON-serialisable set of inputs."""
+    # BLAKE2b is faster than SHA-256 and collision resistance is all a cache key needs
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+def clean_cv_text(text):
+    # Collapse runs of spaces/tabs and blank lines: re-extractions of the same CV
+    # that differ only in layout whitespace then share a cache key
+    pages = [[" ".join(line.split()) for line in page.splitlines()] for page in text.split("\f")]
+    # pdftotext ends every page with a form feed, leaving an empty "page" after the last
+    while len(pages) > 1 and not any(pages[-1]):
+        pages.pop()
+
+    # Page headers/footers sit at the edges of every page; keep their first occurrence
+    # and drop the repeats so they don't eat prompt tokens. Short documents are left
+    # alone: two pages can legitimately share their content
+    repeated = set()
+    if len(pages) >= 3:
+        content = [[line for line in lines if line] for lines in pages]
+        counts = Counter()
+        for lines in content:
+            counts.update(list(dict.fromkeys(lines[:PAGE_EDGE_LINES] + lines[-PAGE_EDGE_LINES:])))
+        # From four pages on, tolerate one page without them (e.g. a cover page)
+        min_pages = len(pages) - 1 if len(pages) >= 4 else len(pages)
+        repeated = {line for line, n in counts.items() if n >= min_pages}
+        # A letterhead can run past the edge window: follow it for as long as
+        # every page matches line for line, from the top and from the bottom
+        for edge in (content, [lines[::-1] for lines in content]):
+            for same in zip(*edge):
+                if len(set(same)) > 1:
+                    break
+                repeated.add(same[0])
+
+    kept, seen = [], set()
+    for line in (line for lines in pages for line in lines):
+        if line in repeated:
+            if line in seen:
+                continue
+            seen.add(line)
+        kept.append(line)
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(kept)).strip()
+
 def ai_process_cv(text):
     print(f"--- 1. PDF TEXT LENGTH: {len(text)} ---")
+    text = clean_cv_text(text)
+    if len(text) > MAX_CV_CHARS:
+        print(f"✂️ CV text truncated to {MAX_CV_CHARS} chars")
+        # Tell the model the text stops early so it doesn't treat the cut as the CV's end
+        text = text[:MAX_CV_CHARS] + "\n[...truncated...]"
+    messages = [
+        {"role": "system", "content": CV_SYSTEM_PROMPT},
+        {"role": "user", "content": CV_PROMPT_TEMPLATE.format(text=text)}
+    ]
+    # Keyed on the full prompt, so editing the template or schema invalidates old entries
+    key = cache_key("cv", CV_MODEL, messages, CV_SCHEMA)
+    cached = ai_cache.get(key)
+    if cached is not None:
+        print("⚡ CV cache hit")
+        return cached
     try:
         # CHANGED: OpenAI Call
         response = client.chat.completions.create(
-            model="gpt-4o",  # Using the Pro/Flagship model
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an expert Headhunter. You must response in JSON format."
-                },
-                {
-                    "role": "user", 
-                    "content": f"""
-                    Input CV Text: {text}
-
-                    TASKS:
-                    1. Identify Real Name.
-                    2. ANONYMIZE content.
-                    3. Identify Seniority.
-                    4. Generate Search Data (Job Titles & Avoid List).
-
-                    CRITICAL: Populate "structured_cv" first.
-
-                    RETURN JSON ONLY with this structure:
-                    {{
-                        "structured_cv": {{
-                            "role_title": "Anonymized Role",
-                            "summary": "Summary...",
-                            "skills": ["Skill1", "Skill2"],
-                            "languages": ["Lang1"],
-                            "experience": [
-                                {{ "title": "Job Title", "company": "Company", "dates": "Dates", "description": "Details..." }}
-                            ],
-                            "education": [
-                                {{ "degree": "Degree", "school": "School", "dates": "Dates" }}
-                            ]
-                        }},
-                        "real_name": "Name",
-                        "job_titles": ["Title1", "Title2"],
-                        "keywords_to_avoid": ["Avoid1", "Avoid2"]
-                    }}
-                    """
-                }
-            ],
-            response_format={ "type": "json_object" }
+            model=CV_MODEL,
+            messages=messages,
+            # Structured outputs: the API enforces CV_SCHEMA, so the prompt doesn't spell it out
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "anonymized_cv", "strict": True, "schema": CV_SCHEMA}
+            },
+            max_completion_tokens=CV_MAX_OUTPUT_TOKENS
         )
         
         response_content = response.choices[0].message.content
         
+        repaired = False
         try:
-            data = json.loads(response_content)
-        except json.JSONDecodeError:
+            data = orjson.loads(response_content)
+        except orjson.JSONDecodeError:
             print("⚠️ JSON Cutoff Detected! Attempting repair...")
-            safe_text = response_content.strip()
-            if not safe_text.endswith("}"): safe_text += '}'
-            try: data = json.loads(safe_text)
-            except: return {"real_name": "Unknown", "job_titles": ["Developer"], "keywords_to_avoid": [], "structured_cv": {"summary": "Error parsing."}}
-            
-        if not data.get("structured_cv", {}).get("experience"):
+            # Closes truncated strings/arrays/objects so partial sections survive
+            data = repair_json(response_content, return_objects=True)
+            repaired = True
+            if not isinstance(data, dict) or not data:
+                return {"real_name": "Unknown", "job_titles": ["Developer"], "keywords_to_avoid": [], "structured_cv": {"summary": "Error parsing."}}
+            # "structured_cv" is generated first, so a cut-off answer is missing the search fields
+            data.setdefault("real_name", "Unknown")
+            data.setdefault("job_titles", ["Developer"])
+            data.setdefault("keywords_to_avoid", [])
+
+        if not data.setdefault("structured_cv", {}).get("experience"):
             data["structured_cv"]["experience"] = [{"title": "Experience", "company": "See Summary", "dates": "Present", "description": "Refer to original CV."}]
             
+        # A repaired (truncated) answer is served but not cached, so a re-upload retries
+        if not repaired:
+            ai_cache.set(key, data, expire=CACHE_TTL)
         return data
 
     except Exception as e:
@@ -180,7 +357,7 @@ def ai_process_cv(text):
 
 def get_ai_scores(jobs, skills_list):
     """
-    Batch processes job scoring with Auto-Retry for Rate Limits.
+    Batch processes job scoring in a single call (rate limits are retried by the client).
     """
     if not jobs or not skills_list: return jobs
 
@@ -217,41 +394,49 @@ def get_ai_scores(jobs, skills_list):
         }
     ]
 
+    key = cache_key("scores", SCORING_MODEL, messages)
+    scores = ai_cache.get(key)
+
     try:
-        # ATTEMPT 1
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            response_format={ "type": "json_object" }
-        )
-    except Exception as e:
-        if "429" in str(e):
-            print("⚠️ OpenAI Quota Exceeded (429). Waiting 60 seconds to cooldown...")
-            time.sleep(65) # Wait 65s to be safe
-            print("♻️ Retrying AI Scoring...")
+        if scores is None:
             try:
-                # ATTEMPT 2 (Retry)
+                # Rate limits (429) are retried with backoff by the client
                 response = client.chat.completions.create(
-                    model="gpt-4o",
+                    model=SCORING_MODEL,
                     messages=messages,
-                    response_format={ "type": "json_object" }
+                    response_format={ "type": "json_object" },
+                    timeout=SCORING_TIMEOUT
                 )
-            except Exception as retry_e:
-                print(f"❌ Retry failed: {retry_e}")
-                return jobs # Return jobs without scores if retry fails
-        else:
-            print(f"Scoring Error: {e}")
-            return jobs
+            except Exception as e:
+                print(f"Scoring Error: {e}")
+                return jobs # Return jobs without scores if the call fails
 
-    # Parse Response
-    try:
-        response_content = response.choices[0].message.content
-        score_data = json.loads(response_content)
-        for item in score_data.get("scores", []):
-            idx = item.get("id")
-            if idx is not None and idx < len(jobs_to_score):
-                jobs[idx]["match_score"] = item.get("score")
-                jobs[idx]["match_reason"] = item.get("reason")
+            # Parse Response
+            response_content = response.choices[0].message.content
+            try:
+                scores = orjson.loads(response_content).get("scores", [])
+                complete = True
+            except orjson.JSONDecodeError:
+                # A cut-off answer still carries the jobs scored so far; keep those (uncached).
+                # The call sets no token cap, so this only catches answers cut off upstream
+                print("⚠️ Scoring JSON cut off, keeping the complete entries")
+                repaired = repair_json(response_content, return_objects=True)
+                scores = repaired.get("scores", []) if isinstance(repaired, dict) else []
+                # repair_json closes the entry that was cut mid-way ("score": 85 -> 8); drop it
+                scores = scores[:-1]
+                complete = False
+            # Validate before caching so a malformed answer isn't replayed for CACHE_TTL
+            scores = [
+                item for item in scores
+                if isinstance(item, dict) and "score" in item
+                and type(item.get("id")) is int and 0 <= item["id"] < len(jobs_to_score)
+            ]
+            if complete:
+                ai_cache.set(key, scores, expire=CACHE_TTL)
+
+        for item in scores:
+            jobs[item["id"]]["match_score"] = item.get("score")
+            jobs[item["id"]]["match_reason"] = item.get("reason")
     except Exception as parse_e:
         print(f"JSON Parse Error: {parse_e}")
 
@@ -262,6 +447,13 @@ def get_ai_scores(jobs, skills_list):
 
     return jobs
 
+def log_jobs_to_sheet(rows):
+    # One values.append call for the whole batch instead of one per job
+    try:
+        sheet.append_rows(rows, value_input_option="RAW")
+    except Exception as e:
+        print(f"Sheet Error: {e}")
+
 # --- ROUTES ---
 
 @app.route('/')
@@ -272,15 +464,17 @@ def home():
 def get_sheet_url():
     return jsonify({"url": SHEET_URL})
 
+@app.errorhandler(413)
+def file_too_large(e):
+    return jsonify({"error": "File too large (max 16 MB)"}), 413
+
 @app.route('/anonymize', methods=['POST'])
 def anonymize():
     if 'file' not in request.files: return jsonify({"error": "No file"}), 400
     file = request.files['file']
     if file.filename == '': return jsonify({"error": "No file"}), 400
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
-    file.save(filepath)
     try:
-        raw_text = extract_text_from_pdf(filepath)
+        raw_text = extract_cv_text(file.read())
         ai_result = ai_process_cv(raw_text)
         return jsonify(ai_result)
     except Exception as e:
@@ -319,9 +513,9 @@ def download_pdf():
             pdf.section_row(heading, f"{edu.get('degree')}\n{edu.get('school')} | {edu.get('dates')}")
             first = False
 
-    output_path = os.path.join(app.config['UPLOAD_FOLDER'], 'anonymous_cv.pdf')
-    pdf.output(output_path)
-    return send_file(output_path, as_attachment=True)
+    # Render in memory: no disk round-trip, and concurrent downloads can't overwrite each other
+    pdf_bytes = pdf.output(dest='S').encode('latin-1')
+    return send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=True, download_name='anonymous_cv.pdf')
 
 @app.route('/search_jobs', methods=['POST'])
 def search_jobs():
@@ -331,27 +525,34 @@ def search_jobs():
     candidate_skills = data.get('cv_skills', []) # Receive Skills
     
     # 1. SMART QUERIES (Onion Strategy)
+    # LinkedIn keyword search is case-insensitive, so dedup on the casefolded query
     search_queries = []
+    seen_queries = set()
+
+    def add_query(q):
+        key = q.casefold()
+        if q and key not in seen_queries:
+            seen_queries.add(key)
+            search_queries.append(q)
+
     for t in raw_titles[:2]: 
-        clean_t = re.sub(r'\(.*?\)', '', t).replace('/', ' ').strip()
-        if clean_t not in search_queries: search_queries.append(clean_t)
+        # Cheap membership checks first: most titles need neither rewrite
+        clean_t = t
+        if '(' in clean_t: clean_t = PAREN_RE.sub('', clean_t)
+        if '/' in clean_t: clean_t = clean_t.translate(TITLE_CLEAN)
+        clean_t = clean_t.strip()
+        add_query(clean_t)
         
         words = clean_t.split()
         if len(words) >= 2:
-            short_t = " ".join(words[:2])
-            if short_t not in search_queries: search_queries.append(short_t)
+            add_query(" ".join(words[:2]))
     
-    search_queries.append("Business Analyst") 
+    add_query("Business Analyst")
 
     # 2. APIFY LINKEDIN JOBS FETCH
-    APIFY_API_KEY = os.environ.get("APIFY_API_KEY")
-    
-    if not APIFY_API_KEY:
+    if not apify_client:
         print("❌ APIFY_API_KEY not set!")
         return jsonify({"error": "Apify API key not configured"}), 500
-
-    from apify_client import ApifyClient
-    apify_client = ApifyClient(APIFY_API_KEY)
     
     raw_results = []
     seen_urls = set()
@@ -399,25 +600,12 @@ def search_jobs():
         print(f"❌ Apify Error: {e}")
 
     # 3. ULTRA-STRICT FILTERING
-    forbidden_words = [
-        "recruitment", "recruiter", "talent acquisition", "hr manager", "human resources", 
-        "headhunter", "agency", "staffing", "werving", "selectie",
-        "supply chain", "logistics", "warehouse", "operations manager", "floor manager", 
-        "store manager", "category manager", "facility", "coordinator", "commissioning",
-        "quality", "environmental", "audit", "compliance", "legal",
-        "sales", "account manager", "marketing", "commercial", "growth", "sme",
-        "financial", "accountant", "tax", "treasury", "controller",
-        "cleaner", "driver", "mechanic", "nurse", "teacher", "internship", "stage"
-    ]
-    
     final_jobs = []
     for job in raw_results:
-        title = job.get('title', '').lower()
-        company = job.get('companyName', '').lower()
         link = job.get('link')
 
-        if any(bad in title for bad in forbidden_words): continue
-        if any(bad in company for bad in forbidden_words): continue
+        if FORBIDDEN_RE.search(job.get('title') or ''): continue
+        if FORBIDDEN_RE.search(job.get('companyName') or ''): continue
         
         # Map Apify fields to existing structure
         final_jobs.append({
@@ -440,9 +628,9 @@ def search_jobs():
     # 5. SAVE
     if sheet and final_jobs:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        for job in final_jobs:
-            try: sheet.append_row([timestamp, candidate_name, job['title'], job['company'], job['location'], job['job_url'], job.get('match_score', 0)])
-            except: pass
+        rows = [[timestamp, candidate_name, job['title'], job['company'], job['location'], job['job_url'], job.get('match_score', 0)] for job in final_jobs]
+        # Fire-and-forget: the response doesn't wait on the Sheets API
+        BACKGROUND.submit(log_jobs_to_sheet, rows)
     
     return jsonify(final_jobs)
 
@@ -451,10 +639,24 @@ def generate_csv():
     data = request.json
     jobs = data.get('jobs', [])
     if not jobs: return jsonify({"error": "No jobs"}), 400
-    df = pd.DataFrame(jobs)
-    csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'found_jobs.csv')
-    df.to_csv(csv_path, index=False)
-    return send_file(csv_path, as_attachment=True)
+    # Rows are checked up front: once streaming starts the 200 is already sent
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        return jsonify({"error": "Jobs must be a list of objects"}), 400
+    # Union of keys in first-seen order, as a DataFrame would build its columns
+    fieldnames = list(dict.fromkeys(key for job in jobs for key in job))
+
+    def generate():
+        # Stream row by row through one small buffer; nothing touches the disk
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator='\n')
+        writer.writeheader()
+        for job in jobs:
+            writer.writerow(job)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    return Response(generate(), mimetype='text/csv', headers={'Content-Disposition': 'attachment; filename=found_jobs.csv'})
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,14 @@
+# Gunicorn loads this file automatically from the working directory,
+# so the Render start command can stay `gunicorn app:app`.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Every slow route waits on the network (OpenAI, Apify, Google Sheets).
+# gevent workers patch sockets so one process overlaps many of those waits.
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_connections = 200
+
+# Apify actor runs are allowed up to 180 s
+timeout = 240
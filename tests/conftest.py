@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# app.py is a top-level script; keep its response cache out of the real cache dir
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="cv_cache_test_"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
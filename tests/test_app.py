@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+import types
+
+import diskcache
+import orjson
+
+import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CV = os.path.join(ROOT, "20251102 Max Cornel CV BV&P.pdf")
+FOOTER = "Op onze overeenkomsten zijn de algemene voorwaarden van Bart Vink & Partners"
+
+
+def _sample_text():
+    with open(SAMPLE_CV, "rb") as f:
+        return app.extract_text_from_pdf(f.read())
+
+
+def test_clean_cv_text_strips_repeated_page_footer():
+    raw = _sample_text()
+    assert raw.count(FOOTER) == 3
+
+    cleaned = app.clean_cv_text(raw)
+    # Kept once, dropped from pages 2 and 3
+    assert cleaned.count(FOOTER) == 1
+    assert cleaned.count("Atoomweg 63") == 1
+    assert cleaned.count("www.bvenp.nl") == 1
+
+
+def test_clean_cv_text_keeps_two_page_documents():
+    text = "Jan Jansen\nAcme B.V.\nPython developer\n\fJan Jansen\nAcme B.V.\nData engineer"
+    cleaned = app.clean_cv_text(text)
+    assert cleaned.count("Jan Jansen") == 2
+    assert cleaned.count("Acme B.V.") == 2
+
+
+def test_clean_cv_text_ignores_trailing_form_feed():
+    # pdftotext output: two pages, each terminated by a form feed
+    text = "Jan Jansen\nAcme B.V.\nPython developer\n\fJan Jansen\nAcme B.V.\nData engineer\n\f"
+    cleaned = app.clean_cv_text(text)
+    assert cleaned.count("Jan Jansen") == 2
+    assert cleaned.count("Acme B.V.") == 2
+
+
+def test_clean_cv_text_keeps_repeated_content_on_short_pages():
+    pages = [
+        "Jan Jansen\nData Engineer\nRabobank\n2019 - 2021\nPython, Spark\nPage 1",
+        "Data Engineer\nRabobank\n2021 - 2023\nAirflow\nPython, Spark\nPage 2",
+        "Education\nTU Delft\nMSc Computer Science\nLanguages\nDutch, English\nPage 3",
+    ]
+    cleaned = app.clean_cv_text("\f".join(pages))
+    assert cleaned.count("Data Engineer") == 2
+    assert cleaned.count("Rabobank") == 2
+    assert cleaned.count("Python, Spark") == 2
+
+
+def test_clean_cv_text_only_strips_page_edges():
+    pages = [f"Header\nLine {i}\nMore {i}\nStill {i}\nAcme B.V.\nThen {i}\nNext {i}\nEnd {i}\nFooter" for i in range(3)]
+    cleaned = app.clean_cv_text("\f".join(pages))
+    assert cleaned.count("Header") == 1
+    assert cleaned.count("Footer") == 1
+    # Mid-page lines are content even when they repeat on every page
+    assert cleaned.count("Acme B.V.") == 3
+
+def test_clean_cv_text_is_identical_across_hash_seeds(tmp_path):
+    # The cleaned text feeds the cache key, so it must not depend on set/dict ordering
+    script = (
+        "import app, sys\n"
+        "with open(sys.argv[1], 'rb') as f:\n"
+        "    text = app.clean_cv_text(app.extract_text_from_pdf(f.read()))\n"
+        "with open(sys.argv[2], 'w', encoding='utf-8') as f:\n"
+        "    f.write(text)\n"
+    )
+    outputs = set()
+    for seed in ("0", "1", "42"):
+        out = tmp_path / f"seed-{seed}.txt"
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        subprocess.run([sys.executable, "-c", script, SAMPLE_CV, str(out)], cwd=ROOT, env=env,
+                       capture_output=True, check=True)
+        outputs.add(out.read_text(encoding="utf-8"))
+    assert outputs == {app.clean_cv_text(_sample_text())}
+
+
+class _FakeCompletions:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = types.SimpleNamespace(content=self.content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason="stop")])
+
+
+def _use_fake_client(monkeypatch, tmp_path, content):
+    completions = _FakeCompletions(content)
+    monkeypatch.setattr(app, "client", types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(app, "ai_cache", diskcache.Cache(str(tmp_path)))
+    return completions
+
+
+def _jobs():
+    return [
+        {"title": "Data Engineer", "company": "Acme", "match_reason": "Analyzing..."},
+        {"title": "Analyst", "company": "Initech", "match_reason": "Analyzing..."},
+    ]
+
+
+def test_get_ai_scores_ignores_malformed_ids(monkeypatch, tmp_path):
+    completions = _use_fake_client(monkeypatch, tmp_path, orjson.dumps({"scores": [
+        {"id": "0", "score": 90, "reason": "string id"},
+        {"id": 5, "score": 80, "reason": "out of range"},
+        {"id": -1, "score": 70, "reason": "negative"},
+        {"id": 1, "score": 60, "reason": "ok"},
+    ]}).decode())
+
+    for _ in range(2):
+        jobs = app.get_ai_scores(_jobs(), ["python"])
+        assert "match_score" not in jobs[0]
+        assert jobs[0]["match_reason"] == "Not evaluated"
+        assert jobs[1]["match_score"] == 60
+    # The second run is served from the cache, which only holds the valid entry
+    assert completions.calls == 1
+
+
+def test_ai_process_cv_fills_search_fields_of_cut_off_answer(monkeypatch, tmp_path):
+    _use_fake_client(monkeypatch, tmp_path, '{"structured_cv": {"role_title": "Data Engineer", "summary": "Builds pipel')
+
+    data = app.ai_process_cv("Jan Jansen, data engineer")
+    assert data["structured_cv"]["role_title"] == "Data Engineer"
+    assert data["real_name"] == "Unknown"
+    assert data["job_titles"] == ["Developer"]
+    assert data["keywords_to_avoid"] == []
+
+
+def test_get_ai_scores_drops_entry_cut_off_mid_way(monkeypatch, tmp_path):
+    _use_fake_client(monkeypatch, tmp_path, '{"scores": [{"id": 0, "score": 70, "reason": "ok"}, {"id": 1, "score": 8')
+
+    jobs = app.get_ai_scores(_jobs(), ["python"])
+    assert jobs[0]["match_score"] == 70
+    assert "match_score" not in jobs[1]
+    assert jobs[1]["match_reason"] == "Not evaluated"
+
+
+def test_generate_csv_streams_rows_and_rejects_malformed_jobs():
+    client = app.app.test_client()
+    response = client.post("/generate_csv", json={"jobs": [{"title": "A", "company": "B"}, {"title": "C", "url": "u"}]})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "title,company,url\nA,B,\nC,,u\n"
+
+    response = client.post("/generate_csv", json={"jobs": [{"title": "A"}, "oops"]})
+    assert response.status_code == 400